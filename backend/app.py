@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import openai
 import json
 import os
+import shutil
+import tempfile
 from dxf_generator import json_to_dxf
+from download_utils import DXF_MEDIA_TYPE, dxf_file_response, ensure_binary_dxf, precompress
+from dxf_stream import stream_plan_dxf, validate_plan
+from plan_history import get_history
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,6 +29,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Uploads bigger than this are spooled to disk instead of memory
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
+# Largest plan /api/render accepts, roughly a million rooms
+MAX_UPLOAD_SIZE = 256 * 1024 * 1024
+
 # Configure OpenAI
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
@@ -33,9 +46,35 @@ ind4 = 0
 
 class ChatMessage(BaseModel):
     message: str
+    session_id: str = "default"
+
+class HistoryRequest(BaseModel):
+    session_id: str = "default"
+
+def load_history(session_id):
+    try:
+        return get_history(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def save_current_plan(history, version):
+    # Make a stored version the current output/floor_plan.json + .dxf
+    floor_plan_data = history.get(version)
+    os.makedirs("output", exist_ok=True)
+    with open("output/floor_plan.json", "w") as f:
+        json.dump(floor_plan_data, f, indent=2)
+
+    # Recently used versions keep their DXF, so undo/redo usually just copies it
+    dxf_path = "output/floor_plan.dxf"
+    shutil.copyfile(history.render(version), dxf_path)
+    precompress(dxf_path)
+    return floor_plan_data
 
 @app.post("/api/chat")
 async def chat(message: ChatMessage):
+    history = load_history(message.session_id)
     try:
         global curr_room_size_global
         global ind2
@@ -146,35 +185,123 @@ async def chat(message: ChatMessage):
 
         print(floor_plan_data , "floor_plan_data")
         
-        # Save JSON file
+        # Generate DXF file first, a reply the renderer can't handle (no floor_plan.rooms etc.)
+        # fails here and never becomes a version in the history
         os.makedirs("output", exist_ok=True)
+        dxf_path = "output/floor_plan.dxf"
+        json_to_dxf(floor_plan_data, dxf_path)
+        precompress(dxf_path)
+
+        # Save JSON file
         json_path = "output/floor_plan.json"
         with open(json_path, "w") as f:
             json.dump(floor_plan_data, f, indent=2)
-        
-        # Generate DXF file
-        dxf_path = "output/floor_plan.dxf"
-        json_to_dxf(floor_plan_data, dxf_path)
+
+        version = history.commit(floor_plan_data, dxf_path)
         
         # Return both the JSON data and success message
         return JSONResponse({
             "status": "success",
             "message": "Floor plan generated successfully",
-            "data": floor_plan_data
+            "data": floor_plan_data,
+            "version": version
         })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Plain def so the first download's compression / binary conversion runs in the threadpool
 @app.get("/api/download")
-async def download_file():
+def download_file(request: Request, binary: bool = False):
     global curr_room_size_global
     file_path = f"output/floor_plan{curr_room_size_global}.dxf"
     print(file_path , "file_path in api/download")
     # file_path = "output/floor_plan.dxf"
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, filename=f"floor_plan{curr_room_size_global}.dxf") 
+    if binary:
+        # Binary DXF is smaller and faster to load, cached next to the ascii file
+        file_path = ensure_binary_dxf(file_path)
+    return dxf_file_response(request, file_path, f"floor_plan{curr_room_size_global}.dxf")
+
+# Plain defs from here on: loading, rebuilding, rendering and compressing versions
+# runs in the threadpool instead of on the event loop
+@app.get("/api/history")
+def list_history(session_id: str = "default"):
+    history = load_history(session_id)
+    return JSONResponse({
+        "current": history.current,
+        "versions": history.list_versions()
+    })
+
+@app.get("/api/history/{version}")
+def get_version(version: int, session_id: str = "default"):
+    history = load_history(session_id)
+    try:
+        floor_plan_data = history.get(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return JSONResponse({"version": version, "data": floor_plan_data})
+
+@app.post("/api/undo")
+def undo(request: HistoryRequest):
+    return restore_version(request.session_id, "undo")
+
+@app.post("/api/redo")
+def redo(request: HistoryRequest):
+    return restore_version(request.session_id, "redo")
+
+def restore_version(session_id, action):
+    global curr_room_size_global
+    history = load_history(session_id)
+    version = history.undo() if action == "undo" else history.redo()
+    if version is None:
+        raise HTTPException(status_code=400, detail=f"Nothing to {action}")
+
+    floor_plan_data = save_current_plan(history, version)
+    # Download the restored plan rather than one of the sample files
+    curr_room_size_global = ''
+    return JSONResponse({
+        "status": "success",
+        "message": f"Floor plan {action} successful",
+        "data": floor_plan_data,
+        "version": version
+    })
+
+@app.post("/api/render")
+async def render_upload(request: Request, binary: bool = False):
+    # Render a posted floor plan JSON straight to DXF, no LLM involved.
+    # The body is spooled to a temp file first so the response never has to be written
+    # while the client is still uploading. It is then checked in one cheap parse pass, so bad
+    # input is a 400, and finally parsed again and rendered in chunks.
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Plan is too large")
+
+    body = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail="Plan is too large")
+            # once past UPLOAD_SPOOL_SIZE this is a disk write, keep it off the event loop
+            await run_in_threadpool(body.write, chunk)
+        body.seek(0)
+        await run_in_threadpool(validate_plan, body)
+    except ValueError as e:
+        body.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        body.close()
+        raise
+
+    return StreamingResponse(
+        stream_plan_dxf(body, binary=binary),
+        media_type=DXF_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="floor_plan.dxf"'},
+        background=BackgroundTask(body.close)
+    )
 
 # @app.get("/api/download_mock")
 # async def download_file_mock(chat_history:str):
@@ -0,0 +1,89 @@
+# Peak memory of the streaming renderer (/api/render) vs. json.load + json_to_dxf.
+#
+#   python benchmark_stream.py                 # 1k, 10k, 50k rooms
+#   python benchmark_stream.py 1000 200000     # custom sizes
+#
+# Every run happens in a fresh subprocess so ru_maxrss is the peak of that run only.
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def write_plan(path, room_count):
+    # Written room by room so generating the input doesn't need the whole plan in memory
+    with open(path, "w") as f:
+        f.write('{"floor_plan": {"dimensions": {"total_area": 0, "unit": "sq_ft"}, "rooms": [')
+        for i in range(room_count):
+            room = {
+                "name": f"Room {i}",
+                "width": 200,
+                "height": 150,
+                "position": {"x": (i % 100) * 200, "y": (i // 100) * 150},
+                "doors": [{"position": "right", "width": 30}],
+                "windows": [{"position": "top", "width": 50}],
+            }
+            if i:
+                f.write(",")
+            f.write(json.dumps(room))
+        f.write("]}}")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stream(plan_path, out_path):
+    # validate + render, the same two passes /api/render makes
+    from dxf_stream import stream_plan_dxf, validate_plan
+    with open(plan_path, "rb") as source, open(out_path, "wb") as out:
+        validate_plan(source)
+        for chunk in stream_plan_dxf(source):
+            out.write(chunk)
+
+
+def run_in_memory(plan_path, out_path):
+    from dxf_generator import json_to_dxf
+    with open(plan_path) as f:
+        json_to_dxf(json.load(f), out_path)
+
+
+def child(mode, plan_path, out_path):
+    start = time.perf_counter()
+    run_stream(plan_path, out_path) if mode == "stream" else run_in_memory(plan_path, out_path)
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(mode, plan_path, out_path):
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", mode, plan_path, out_path],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(sizes):
+    print(f"{'rooms':>8} {'input MB':>9} {'mode':>10} {'peak RSS MB':>12} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        plan_path = os.path.join(tmp, "plan.json")
+        out_path = os.path.join(tmp, "plan.dxf")
+        for size in sizes:
+            write_plan(plan_path, size)
+            input_mb = os.path.getsize(plan_path) / (1024 * 1024)
+            for mode in ("stream", "in-memory"):
+                result = measure(mode, plan_path, out_path)
+                print(f"{size:>8} {input_mb:>9.1f} {mode:>10} {result['peak_rss_mb']:>12.1f} {result['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:5])
+    else:
+        main([int(n) for n in sys.argv[1:]] or DEFAULT_SIZES)
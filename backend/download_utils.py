@@ -0,0 +1,236 @@
+import gzip
+import os
+import tempfile
+import ezdxf
+from fastapi.responses import FileResponse, Response
+
+# brotli is optional, we just skip the .br variant if it's not installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DXF_MEDIA_TYPE = "image/vnd.dxf"
+
+# encoding name -> file suffix of the precompressed variant stored next to the dxf
+ENCODING_SUFFIXES = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+# Brotli quality when compressing on the first download instead of right after generation,
+# 11 (the default) takes over a second on the bigger sample files
+LAZY_BROTLI_QUALITY = 5
+
+
+def binary_dxf_path(path):
+    # floor_plan.dxf -> floor_plan.bin.dxf (binary dxf keeps the .dxf extension)
+    root, ext = os.path.splitext(path)
+    return f"{root}.bin{ext}"
+
+
+def ensure_binary_dxf(path):
+    # Convert an ascii dxf to binary dxf once and cache it next to the original
+    bin_path = binary_dxf_path(path)
+    if not _is_fresh(bin_path, path):
+        doc = ezdxf.readfile(path)
+        tmp_path = _temp_path(bin_path)
+        try:
+            doc.saveas(tmp_path, fmt='bin')
+            os.replace(tmp_path, bin_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return bin_path
+
+
+def _temp_path(path):
+    # Temp file in the same directory, so os.replace into place is atomic
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    return tmp_path
+
+
+def write_atomic(path, data):
+    # Other workers only ever see the old file or the complete new one, never a partial write
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _is_fresh(variant_path, source_path):
+    return (
+        os.path.exists(variant_path)
+        and os.path.getmtime(variant_path) >= os.path.getmtime(source_path)
+    )
+
+
+def precompress(path, brotli_quality=11):
+    # Write .gz / .br variants next to the file, only when missing or stale
+    gz_path = path + ENCODING_SUFFIXES["gzip"]
+    br_path = path + ENCODING_SUFFIXES["br"]
+    need_gz = not _is_fresh(gz_path, path)
+    need_br = brotli is not None and not _is_fresh(br_path, path)
+    if not (need_gz or need_br):
+        return
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if need_gz:
+        # mtime=0 so the same dxf always gives the same bytes
+        write_atomic(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+    if need_br:
+        write_atomic(br_path, brotli.compress(data, mode=brotli.MODE_TEXT, quality=brotli_quality))
+
+
+def parse_accept_encoding(header):
+    # Returns {encoding: q} from an Accept-Encoding header
+    encodings = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(header):
+    # Pick the available encoding with the highest q (br wins ties), None means identity.
+    # Returns "unacceptable" when the client rules out identity and everything we have.
+    accepted = parse_accept_encoding(header or "")
+    star = accepted.get("*")
+
+    best, best_q = None, 0.0
+    for encoding in ENCODING_SUFFIXES:
+        if encoding == "br" and brotli is None:
+            continue
+        q = accepted.get(encoding, star or 0.0)
+        # ENCODING_SUFFIXES lists br first, so on a tie it stays the pick
+        if q > best_q:
+            best, best_q = encoding, q
+
+    # identity only beats a compressed variant when the client ranks it higher explicitly
+    if best is not None and accepted.get("identity", 0.0) <= best_q:
+        return best
+
+    # identity is fine unless excluded by identity;q=0, or *;q=0 without an identity entry
+    identity_q = accepted.get("identity", 1.0 if star is None else star)
+    if identity_q > 0:
+        return None
+    return "unacceptable"
+
+
+def make_etag(path, encoding=None):
+    stat = os.stat(path)
+    tag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if encoding:
+        tag += f"-{encoding}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # weak comparison, W/"x" matches "x"
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(range_header, size):
+    # Only a single "bytes=start-end" range is supported, anything else -> None (full file)
+    # Returns (start, end) inclusive, or "unsatisfiable"
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_str, sep, end_str = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                return "unsatisfiable"
+            start = max(size - length, 0)
+            end = size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    # An invalid range-spec (end before start) means ignoring the header, not a 416
+    if start < 0 or (end_str and start > end):
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, min(end, size - 1)
+
+
+def dxf_file_response(request, path, filename):
+    # Serve a dxf with content negotiation (gzip/br), If-None-Match and Range support
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding == "unacceptable":
+        return Response(status_code=406, headers={"Vary": "Accept-Encoding"})
+
+    serve_path = path
+    if encoding:
+        precompress(path, brotli_quality=LAZY_BROTLI_QUALITY)
+        serve_path = path + ENCODING_SUFFIXES[encoding]
+
+    etag = make_etag(serve_path, encoding)
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(serve_path)
+    byte_range = parse_range(request.headers.get("range"), size)
+
+    # If-Range: only honour the range when the client's copy is still current
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is not None:
+        start, end = byte_range
+        with open(serve_path, "rb") as f:
+            f.seek(start)
+            content = f.read(end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return Response(content, status_code=206, headers=headers, media_type=DXF_MEDIA_TYPE)
+
+    return FileResponse(serve_path, filename=filename, headers=headers, media_type=DXF_MEDIA_TYPE)
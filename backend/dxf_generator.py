@@ -1,111 +1,113 @@
 import ezdxf
 import json
 
+# Layer name -> color, shared with the streaming writer in dxf_stream.py
+LAYER_COLORS = {
+    'ROOMS': 1,  # Red color for rooms
+    'TEXT': 2,  # Yellow color for text
+    'WALLS': 7,  # Walls (default color)
+    'DOORS': 5,  # Blue color for doors
+    'WINDOWS': 6,  # Green color for windows
+}
+
+OPENING_LINEWEIGHTS = {'DOORS': 2, 'WINDOWS': 1}
+
+TEXT_HEIGHT = 5  # Much smaller text height
+LABEL_OFFSET = 5  # Smaller offset to move the text closer to the bottom part of the room
+
+
+def room_corners(room):
+    # Room's bottom-left corner
+    x_offset = room['position']['x']
+    y_offset = room['position']['y']
+    width = room['width']
+    height = room['height']
+
+    # Define the four corners of the room
+    return [
+        (x_offset, y_offset),  # Bottom-left
+        (x_offset + width, y_offset),  # Bottom-right
+        (x_offset + width, y_offset + height),  # Top-right
+        (x_offset, y_offset + height)  # Top-left
+    ]
+
+
+def room_label(room):
+    # Label text and insert point, just above the bottom edge in the middle of the room
+    center_x = room['position']['x'] + room['width'] / 2
+    center_y = room['position']['y']  # This places the text near the bottom part of the room
+    label_text = f"{room['name']} ({room['width']}×{room['height']})"
+    return label_text, (center_x, center_y + LABEL_OFFSET)
+
+
+def opening_line(wall, opening_width, x_offset, y_offset, width, height):
+    # Start and end of a door/window centered on one of the room's walls
+    if wall == 'top':
+        x = x_offset + width / 2 - opening_width / 2
+        y = y_offset + height
+        return (x, y), (x + opening_width, y)
+
+    elif wall == 'bottom':
+        x = x_offset + width / 2 - opening_width / 2
+        y = y_offset
+        return (x, y), (x + opening_width, y)
+
+    elif wall == 'left':
+        x = x_offset
+        y = y_offset + height / 2 - opening_width / 2
+        return (x, y), (x, y + opening_width)
+
+    elif wall == 'right':
+        x = x_offset + width
+        y = y_offset + height / 2 - opening_width / 2
+        return (x, y), (x, y + opening_width)
+
+    return None
+
+
+def room_openings(room):
+    # Yields (layer, start, end) for every door and window of the room
+    x_offset = room['position']['x']
+    y_offset = room['position']['y']
+    for layer, key in (('DOORS', 'doors'), ('WINDOWS', 'windows')):
+        for opening in room.get(key, []):
+            line = opening_line(opening['position'], opening['width'], x_offset, y_offset, room['width'], room['height'])
+            if line is not None:
+                yield layer, line[0], line[1]
+
+
 def json_to_dxf(json_data, output_path):
     # Create a new DXF document
     doc = ezdxf.new('R2010')
     msp = doc.modelspace()
 
     # Add layers for different elements
-    doc.layers.new(name='ROOMS', dxfattribs={'color': 1, 'linetype': 'Continuous'})  # Red color for rooms
-    doc.layers.new(name='TEXT', dxfattribs={'color': 2})   # Yellow color for text
-    doc.layers.new(name='WALLS', dxfattribs={'color': 7, 'linetype': 'Continuous'})  # Walls (default color)
-    doc.layers.new(name='DOORS', dxfattribs={'color': 5, 'linetype': 'Continuous'})  # Blue color for doors
-    doc.layers.new(name='WINDOWS', dxfattribs={'color': 6, 'linetype': 'Continuous'})  # Green color for windows
-
-    # Buffer for spacing between rooms and text
-    room_buffer = 10
-    label_offset = 5  # Smaller offset to move the text closer to the bottom part of the room
+    for name, color in LAYER_COLORS.items():
+        attribs = {'color': color}
+        if name != 'TEXT':
+            attribs['linetype'] = 'Continuous'
+        doc.layers.new(name=name, dxfattribs=attribs)
 
     # Process each room
     for room in json_data['floor_plan']['rooms']:
-        name = room['name']
-        width = room['width']
-        height = room['height']
-        position = room['position']
-        
-        # Room's bottom-left corner
-        x_offset = position['x']
-        y_offset = position['y']
-
-        # Define the four corners of the room
-        points = [
-            (x_offset, y_offset),  # Bottom-left
-            (x_offset + width, y_offset),  # Bottom-right
-            (x_offset + width, y_offset + height),  # Top-right
-            (x_offset, y_offset + height)  # Top-left
-        ]
-
         # Add a polyline for the room (rectangle)
-        msp.add_lwpolyline(points, dxfattribs={'layer': 'ROOMS', 'closed': True, 'lineweight': 2})
+        msp.add_lwpolyline(room_corners(room), dxfattribs={'layer': 'ROOMS', 'closed': True, 'lineweight': 2})
 
         # Add text for the room name just above the bottom edge
-        center_x = x_offset + width / 2
-        center_y = y_offset  # This places the text near the bottom part of the room
-        label_text = f"{name} ({width}×{height})"
-        # Adjust text position to avoid overlap (just above the bottom edge)
+        label_text, insert = room_label(room)
         msp.add_text(
             label_text,
             dxfattribs={
                 'layer': 'TEXT',
-                'height': 5,  # Much smaller text height
+                'height': TEXT_HEIGHT,
                 'style': 'Standard',
-                'insert': (center_x, center_y + label_offset)  # Slightly above the bottom edge
+                'insert': insert  # Slightly above the bottom edge
             }
         )
 
-        # Draw doors for the room (every room should have a door)
-        if 'doors' in room:
-            for door in room['doors']:
-                door_position = door['position']
-                door_width = door['width']
-
-                # Ensure the door is placed inside the room
-                if door_position == 'top':
-                    door_x = x_offset + width / 2 - door_width / 2
-                    door_y = y_offset + height
-                    msp.add_line((door_x, door_y), (door_x + door_width, door_y), dxfattribs={'layer': 'DOORS', 'lineweight': 2})
-                
-                elif door_position == 'bottom':
-                    door_x = x_offset + width / 2 - door_width / 2
-                    door_y = y_offset
-                    msp.add_line((door_x, door_y), (door_x + door_width, door_y), dxfattribs={'layer': 'DOORS', 'lineweight': 2})
-                
-                elif door_position == 'left':
-                    door_x = x_offset
-                    door_y = y_offset + height / 2 - door_width / 2
-                    msp.add_line((door_x, door_y), (door_x, door_y + door_width), dxfattribs={'layer': 'DOORS', 'lineweight': 2})
-                
-                elif door_position == 'right':
-                    door_x = x_offset + width
-                    door_y = y_offset + height / 2 - door_width / 2
-                    msp.add_line((door_x, door_y), (door_x, door_y + door_width), dxfattribs={'layer': 'DOORS', 'lineweight': 2})
-
-        # Draw windows for the room (windows are smaller and placed on one of the walls)
-        if 'windows' in room:
-            for window in room['windows']:
-                window_position = window['position']
-                window_width = window['width']
-
-                if window_position == 'top':
-                    window_x = x_offset + width / 2 - window_width / 2
-                    window_y = y_offset + height
-                    msp.add_line((window_x, window_y), (window_x + window_width, window_y), dxfattribs={'layer': 'WINDOWS', 'lineweight': 1})
-                
-                elif window_position == 'bottom':
-                    window_x = x_offset + width / 2 - window_width / 2
-                    window_y = y_offset
-                    msp.add_line((window_x, window_y), (window_x + window_width, window_y), dxfattribs={'layer': 'WINDOWS', 'lineweight': 1})
-                
-                elif window_position == 'left':
-                    window_x = x_offset
-                    window_y = y_offset + height / 2 - window_width / 2
-                    msp.add_line((window_x, window_y), (window_x, window_y + window_width), dxfattribs={'layer': 'WINDOWS', 'lineweight': 1})
-                
-                elif window_position == 'right':
-                    window_x = x_offset + width
-                    window_y = y_offset + height / 2 - window_width / 2
-                    msp.add_line((window_x, window_y), (window_x, window_y + window_width), dxfattribs={'layer': 'WINDOWS', 'lineweight': 1})
+        # Draw doors (every room should have a door) and windows on the room's walls
+        for layer, start, end in room_openings(room):
+            msp.add_line(start, end, dxfattribs={'layer': layer, 'lineweight': OPENING_LINEWEIGHTS[layer]})
 
     # Save the DXF file
     doc.saveas(output_path)
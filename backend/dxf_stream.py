@@ -0,0 +1,126 @@
+import ezdxf  # registers the "dxfreplace" codec error handler
+import ijson
+from ezdxf.addons.r12writer import BinaryDXFWriter, R12FastStreamWriter
+from dxf_generator import LAYER_COLORS, TEXT_HEIGHT, room_corners, room_label, room_openings
+
+# Rooms are parsed one at a time and the rendered DXF is flushed every ROOMS_PER_CHUNK rooms,
+# so memory depends on the chunk size and not on how many rooms the plan has
+ROOMS_PER_CHUNK = 500
+
+
+class _ChunkBuffer:
+    # Collects what r12writer writes until the next chunk is handed to the client
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+    def take(self):
+        parts, self.parts = self.parts, []
+        if parts and isinstance(parts[0], str):
+            # R12 ascii dxf is cp1252, anything else becomes a \U+XXXX escape
+            return "".join(parts).encode("cp1252", errors="dxfreplace")
+        return b"".join(parts)
+
+
+def _r12_preface():
+    # HEADER and TABLES written ahead of the entities, so the layers and their colors
+    # match json_to_dxf's. The output is still R12, which has no LWPOLYLINE (rooms are 2D
+    # POLYLINEs here) and no lineweights, so OPENING_LINEWEIGHTS and the room outline
+    # lineweight are not carried over.
+    tags = [
+        (0, "SECTION"), (2, "HEADER"),
+        (9, "$ACADVER"), (1, "AC1009"),
+        (9, "$DWGCODEPAGE"), (3, "ANSI_1252"),
+        (0, "ENDSEC"),
+        (0, "SECTION"), (2, "TABLES"),
+        (0, "TABLE"), (2, "LTYPE"), (70, 1),
+        (0, "LTYPE"), (2, "CONTINUOUS"), (70, 0), (3, "Solid line"), (72, 65), (73, 0), (40, 0.0),
+        (0, "ENDTAB"),
+        (0, "TABLE"), (2, "LAYER"), (70, len(LAYER_COLORS) + 1),
+        (0, "LAYER"), (2, "0"), (70, 0), (62, 7), (6, "CONTINUOUS"),
+    ]
+    for name, color in LAYER_COLORS.items():
+        tags += [(0, "LAYER"), (2, name), (70, 0), (62, color), (6, "CONTINUOUS")]
+    tags += [
+        (0, "ENDTAB"),
+        (0, "TABLE"), (2, "STYLE"), (70, 1),
+        (0, "STYLE"), (2, "STANDARD"), (70, 0), (40, 0.0), (41, 1.0), (50, 0.0), (71, 0),
+        (42, 2.5), (3, "txt"), (4, ""),
+        (0, "ENDTAB"),
+        (0, "ENDSEC"),
+    ]
+    return "".join(f"{code}\n{value}\n" for code, value in tags)
+
+
+R12_PREFACE = _r12_preface()
+
+
+def write_room(dxf, room):
+    # Entities are drawn ByLayer, the colors come from the LAYER table in R12_PREFACE
+    dxf.add_polyline_2d(room_corners(room), closed=True, layer='ROOMS')
+
+    label_text, insert = room_label(room)
+    dxf.add_text(label_text, insert=insert, height=TEXT_HEIGHT, layer='TEXT')
+
+    for layer, start, end in room_openings(room):
+        dxf.add_line(start, end, layer=layer)
+
+
+def plan_rooms(source):
+    # Rooms of floor_plan.rooms, parsed one at a time. Raises ValueError when the body
+    # isn't valid JSON or has no floor_plan.rooms array.
+    found = []
+
+    def events():
+        for prefix, event, value in ijson.parse(source, use_float=True):
+            if prefix == "floor_plan.rooms" and event == "start_array":
+                found.append(True)
+            yield prefix, event, value
+
+    try:
+        yield from ijson.items(events(), "floor_plan.rooms.item")
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not found:
+        raise ValueError("Plan has no floor_plan.rooms array")
+
+
+def check_room(room):
+    # The same lookups the renderer does, and numbers wherever the DXF needs a coordinate
+    for value in (room['width'], room['height'], room['position']['x'], room['position']['y']):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"expected a number, got {value!r}")
+    room_label(room)
+    for _ in room_openings(room):
+        pass
+
+
+def validate_plan(source):
+    # Full parse of the plan without rendering anything, so bad input (invalid JSON, trailing
+    # garbage, no floor_plan.rooms, a broken room anywhere) is a ValueError before the response
+    # starts. Rewinds `source` afterwards.
+    for count, room in enumerate(plan_rooms(source), 1):
+        try:
+            check_room(room)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Room {count} is invalid: {e!r}")
+    source.seek(0)
+
+
+def stream_plan_dxf(source, binary=False):
+    # Render the plan JSON in `source` (a binary file object) to an R12 DXF, yielding bytes
+    # chunk by chunk. No ezdxf document is built.
+    # Run validate_plan first, a bad room found here can only stop the stream, and the client
+    # gets a DXF without the EOF tail.
+    buffer = _ChunkBuffer()
+    stream = BinaryDXFWriter(buffer) if binary else buffer
+    stream.write(R12_PREFACE)
+    dxf = R12FastStreamWriter(stream)
+    for count, room in enumerate(plan_rooms(source), 1):
+        write_room(dxf, room)
+        if count % ROOMS_PER_CHUNK == 0:
+            yield buffer.take()
+    dxf.close()
+    yield buffer.take()
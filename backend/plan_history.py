@@ -0,0 +1,268 @@
+import copy
+import json
+import os
+import re
+import shutil
+from collections import OrderedDict
+from dxf_generator import json_to_dxf
+from download_utils import write_atomic
+
+HISTORY_DIR = os.path.join("output", "history")
+
+# Every SNAPSHOT_INTERVAL versions along a chain we store the full plan instead of a delta,
+# so rebuilding any version never replays more than this many deltas
+SNAPSHOT_INTERVAL = 10
+
+# How many rebuilt plans to keep in memory per session
+PLAN_CACHE_SIZE = 16
+
+# How many rendered DXFs to keep on disk per session (most recently used, so the
+# undo/redo neighbours of the current version), older ones are rebuilt from the deltas
+RENDER_CACHE_SIZE = 4
+
+# How many sessions to keep loaded, the rest are reloaded from their index.json when used
+SESSION_CACHE_SIZE = 64
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_sessions = OrderedDict()
+
+
+def room_keys(rooms):
+    # Rooms are matched by (name, n), n counts repeated names so duplicates stay distinct
+    keys = []
+    seen = {}
+    for room in rooms:
+        name = room.get("name", "")
+        seen[name] = seen.get(name, 0) + 1
+        keys.append((name, seen[name]))
+    return keys
+
+
+def _without(data, key):
+    return {k: v for k, v in data.items() if k != key}
+
+
+def diff_plans(old, new):
+    # Structural delta between two plans: rooms added, removed or changed (moved, resized, ...)
+    # Room keys are stored as [name, n] lists since JSON objects can't have tuple keys
+    old_fp = old["floor_plan"]
+    new_fp = new["floor_plan"]
+    old_keys = room_keys(old_fp["rooms"])
+    new_keys = room_keys(new_fp["rooms"])
+    old_rooms = dict(zip(old_keys, old_fp["rooms"]))
+    new_rooms = dict(zip(new_keys, new_fp["rooms"]))
+
+    delta = {"added": [], "removed": [], "changed": []}
+    for key, room in new_rooms.items():
+        if key not in old_rooms:
+            delta["added"].append([*key, room])
+        elif room != old_rooms[key]:
+            old_room = old_rooms[key]
+            delta["changed"].append([*key, {
+                "set": {f: v for f, v in room.items() if f not in old_room or old_room[f] != v},
+                "unset": [f for f in old_room if f not in room],
+            }])
+    delta["removed"] = [list(key) for key in old_keys if key not in new_rooms]
+
+    # Room order only needs storing when it isn't "old order, then new rooms at the end"
+    added_keys = [key for key in new_keys if key not in old_rooms]
+    expected = [k for k in old_keys if k in new_rooms] + added_keys
+    if expected != new_keys:
+        delta["order"] = [list(key) for key in new_keys]
+
+    # Anything besides the rooms (dimensions etc.) is small, store it whole if it changed
+    if _without(old_fp, "rooms") != _without(new_fp, "rooms"):
+        delta["floor_plan"] = _without(new_fp, "rooms")
+    if _without(old, "floor_plan") != _without(new, "floor_plan"):
+        delta["extra"] = _without(new, "floor_plan")
+    return delta
+
+
+def apply_delta(plan, delta):
+    fp = plan["floor_plan"]
+    keys = room_keys(fp["rooms"])
+    rooms = dict(zip(keys, fp["rooms"]))
+
+    for name, n in delta["removed"]:
+        del rooms[(name, n)]
+    for name, n, change in delta["changed"]:
+        room = dict(rooms[(name, n)])
+        room.update(change["set"])
+        for field in change["unset"]:
+            room.pop(field, None)
+        rooms[(name, n)] = room
+    added_keys = []
+    for name, n, room in delta["added"]:
+        rooms[(name, n)] = room
+        added_keys.append((name, n))
+
+    if "order" in delta:
+        order = [tuple(key) for key in delta["order"]]
+    else:
+        order = [k for k in keys if k in rooms] + added_keys
+    new_fp = delta.get("floor_plan", _without(fp, "rooms"))
+    new_plan = dict(delta.get("extra", _without(plan, "floor_plan")))
+    new_plan["floor_plan"] = {**new_fp, "rooms": [rooms[key] for key in order]}
+    return new_plan
+
+
+class PlanHistory:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.path = os.path.join(HISTORY_DIR, session_id)
+        self.index_path = os.path.join(self.path, "index.json")
+        self._cache = OrderedDict()
+        if os.path.exists(self.index_path):
+            # The index is only ever replaced whole, so failing to read it is a server problem
+            # (RuntimeError), not something the client did wrong (ValueError)
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError) as e:
+                raise RuntimeError(f"History index for session {session_id!r} is unreadable: {e}")
+        else:
+            # versions: {version: {"parent": ..., "kind": "snapshot" | "delta", "depth": ...}}
+            self.index = {"versions": {}, "current": None, "redo": [], "rendered": []}
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        write_atomic(self.index_path, json.dumps(self.index, indent=2).encode())
+
+    def _version_path(self, version, ext):
+        return os.path.join(self.path, f"v{version}.{ext}")
+
+    def _entry(self, version):
+        entry = self.index["versions"].get(str(version))
+        if entry is None:
+            raise KeyError(f"Version {version} not found")
+        return entry
+
+    def _remember(self, version, plan):
+        self._cache[version] = plan
+        self._cache.move_to_end(version)
+        while len(self._cache) > PLAN_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _load(self, version):
+        if version in self._cache:
+            self._cache.move_to_end(version)
+            return self._cache[version]
+
+        # Walk back to the nearest snapshot (or cached plan), then replay deltas forward
+        chain = []
+        current = version
+        plan = None
+        while True:
+            if current in self._cache:
+                plan = self._cache[current]
+                break
+            entry = self._entry(current)
+            with open(self._version_path(current, "json")) as f:
+                data = json.load(f)
+            if entry["kind"] == "snapshot":
+                plan = data
+                self._remember(current, plan)
+                break
+            chain.append((current, data))
+            current = entry["parent"]
+
+        for v, delta in reversed(chain):
+            plan = apply_delta(plan, delta)
+            self._remember(v, plan)
+        return plan
+
+    @property
+    def current(self):
+        return self.index["current"]
+
+    def list_versions(self):
+        return [
+            {"version": int(v), "parent": e["parent"], "kind": e["kind"]}
+            for v, e in self.index["versions"].items()
+        ]
+
+    def get(self, version):
+        return copy.deepcopy(self._load(version))
+
+    def commit(self, plan, dxf_path=None):
+        # Store a new version as a child of the current one, returns its number.
+        # dxf_path is the plan's already rendered DXF, reused instead of rendering it again
+        parent = self.current
+        version = max((int(v) for v in self.index["versions"]), default=0) + 1
+
+        data = plan
+        kind = "snapshot"
+        depth = 0
+        if parent is not None:
+            parent_depth = self._entry(parent)["depth"]
+            if parent_depth + 1 < SNAPSHOT_INTERVAL:
+                delta = diff_plans(self._load(parent), plan)
+                # A delta that's bigger than the plan itself isn't worth keeping
+                if len(json.dumps(delta)) < len(json.dumps(plan)):
+                    data, kind, depth = delta, "delta", parent_depth + 1
+
+        os.makedirs(self.path, exist_ok=True)
+        write_atomic(self._version_path(version, "json"), json.dumps(data).encode())
+        if dxf_path is not None:
+            shutil.copyfile(dxf_path, self._version_path(version, "dxf"))
+            self._keep_render(version)
+
+        self.index["versions"][str(version)] = {"parent": parent, "kind": kind, "depth": depth}
+        self.index["current"] = version
+        self.index["redo"] = []
+        self._save_index()
+        self._remember(version, copy.deepcopy(plan))
+        return version
+
+    def undo(self):
+        if self.current is None:
+            return None
+        parent = self._entry(self.current)["parent"]
+        if parent is None:
+            return None
+        self.index["redo"].append(self.current)
+        self.index["current"] = parent
+        self._save_index()
+        return parent
+
+    def redo(self):
+        if not self.index["redo"]:
+            return None
+        self.index["current"] = self.index["redo"].pop()
+        self._save_index()
+        return self.current
+
+    def _keep_render(self, version):
+        # Mark a version's DXF as most recently used and delete the ones that fall off the end
+        rendered = self.index["rendered"]
+        if version in rendered:
+            rendered.remove(version)
+        rendered.append(version)
+        while len(rendered) > RENDER_CACHE_SIZE:
+            dxf_path = self._version_path(rendered.pop(0), "dxf")
+            if os.path.exists(dxf_path):
+                os.remove(dxf_path)
+
+    def render(self, version):
+        # DXF for a version, rendered from the (rebuilt) plan unless it's still cached
+        dxf_path = self._version_path(version, "dxf")
+        if version not in self.index["rendered"] or not os.path.exists(dxf_path):
+            json_to_dxf(self._load(version), dxf_path)
+        self._keep_render(version)
+        self._save_index()
+        return dxf_path
+
+
+def get_history(session_id):
+    if not SESSION_ID_RE.match(session_id):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    if session_id in _sessions:
+        _sessions.move_to_end(session_id)
+        return _sessions[session_id]
+
+    history = PlanHistory(session_id)
+    _sessions[session_id] = history
+    while len(_sessions) > SESSION_CACHE_SIZE:
+        _sessions.popitem(last=False)
+    return history
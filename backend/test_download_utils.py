@@ -0,0 +1,135 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import download_utils
+from download_utils import choose_encoding, etag_matches, parse_range
+
+DXF = b"0\nSECTION\n2\nENTITIES\n" + b"0\nLINE\n8\nROOMS\n10\n0\n20\n0\n11\n10\n21\n0\n" * 200 + b"0\nENDSEC\n0\nEOF\n"
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "plan.dxf"
+    path.write_bytes(DXF)
+
+    app = FastAPI()
+
+    @app.get("/plan")
+    def plan(request: Request):
+        return download_utils.dxf_file_response(request, str(path), "plan.dxf")
+
+    return TestClient(app)
+
+
+def get(client, **headers):
+    # no automatic decoding, so the raw (compressed) body can be checked
+    headers.setdefault("accept-encoding", "identity")
+    with client.stream("GET", "/plan", headers=headers) as response:
+        response.raw_body = b"".join(response.iter_raw())
+    return response
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.1", "gzip"),
+    ("gzip;q=0.5, br;q=0.5", "br"),
+    ("deflate", None),
+    ("gzip;q=0", None),
+    ("identity, gzip;q=0.5", None),
+    ("identity;q=0, gzip", "gzip"),
+    ("identity;q=0", "unacceptable"),
+    ("*;q=0", "unacceptable"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(download_utils, "brotli", None)
+    assert choose_encoding("br, gzip;q=0.5") == "gzip"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=50-500", (50, 99)),
+    ("bytes=5-3", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-9", None),
+    ("bytes=100-", "unsatisfiable"),
+    ("bytes=-0", "unsatisfiable"),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_full_download(client):
+    response = get(client)
+    assert response.status_code == 200
+    assert response.raw_body == DXF
+    assert "content-encoding" not in response.headers
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_gzip_download(client):
+    response = get(client, **{"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.raw_body) < len(DXF)
+    assert gzip.decompress(response.raw_body) == DXF
+
+
+def test_not_acceptable(client):
+    assert get(client, **{"accept-encoding": "identity;q=0"}).status_code == 406
+
+
+@pytest.mark.parametrize("weak", [False, True])
+def test_if_none_match(client, weak):
+    etag = get(client).headers["etag"]
+    response = get(client, **{"if-none-match": f"W/{etag}" if weak else etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    # the gzip variant has its own etag
+    assert get(client, **{"accept-encoding": "gzip", "if-none-match": etag}).status_code == 200
+
+
+def test_range(client):
+    response = get(client, range="bytes=10-19")
+    assert response.status_code == 206
+    assert response.raw_body == DXF[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(DXF)}"
+
+
+def test_range_not_satisfiable(client):
+    response = get(client, range=f"bytes={len(DXF)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DXF)}"
+
+
+def test_invalid_range_ignored(client):
+    response = get(client, range="bytes=5-3")
+    assert response.status_code == 200
+    assert response.raw_body == DXF
+
+
+def test_if_range(client):
+    etag = get(client).headers["etag"]
+    assert get(client, range="bytes=0-9", **{"if-range": etag}).status_code == 206
+
+    response = get(client, range="bytes=0-9", **{"if-range": '"stale"'})
+    assert response.status_code == 200
+    assert response.raw_body == DXF
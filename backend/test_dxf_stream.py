@@ -0,0 +1,84 @@
+import io
+import json
+import ezdxf
+import pytest
+from fastapi.testclient import TestClient
+import app
+import dxf_stream
+from dxf_generator import LAYER_COLORS
+
+
+@pytest.fixture
+def client():
+    return TestClient(app.app)
+
+
+def make_room(i):
+    return {
+        "name": f"Room {i}",
+        "width": 200,
+        "height": 150,
+        "position": {"x": (i % 100) * 200, "y": (i // 100) * 150},
+        "doors": [{"position": "right", "width": 30}],
+        "windows": [{"position": "top", "width": 50}],
+    }
+
+
+def plan_body(rooms):
+    return json.dumps({"floor_plan": {"dimensions": {"total_area": 0, "unit": "sq_ft"}, "rooms": rooms}})
+
+
+def read_dxf(tmp_path, data):
+    path = tmp_path / "plan.dxf"
+    path.write_bytes(data)
+    return ezdxf.readfile(str(path))
+
+
+@pytest.mark.parametrize("body, detail", [
+    ("not json", "Invalid JSON"),
+    (plan_body([make_room(0)]) + " trailing", "Invalid JSON"),
+    ('{"foo": 1}', "no floor_plan.rooms"),
+    ('{"floor_plan": {"rooms": 5}}', "no floor_plan.rooms"),
+    (plan_body([{"name": "A", "height": 10, "position": {"x": 0, "y": 0}}]), "Room 1 is invalid"),
+    (plan_body([make_room(0), make_room(1), {**make_room(2), "width": "wide"}]), "Room 3 is invalid"),
+])
+def test_bad_input_is_400(client, body, detail):
+    response = client.post("/api/render", content=body)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_too_large_is_413(client, monkeypatch):
+    monkeypatch.setattr(app, "MAX_UPLOAD_SIZE", 100)
+    response = client.post("/api/render", content=plan_body([make_room(i) for i in range(5)]))
+    assert response.status_code == 413
+
+
+def test_empty_rooms(client, tmp_path):
+    response = client.post("/api/render", content=plan_body([]))
+    assert response.status_code == 200
+    doc = read_dxf(tmp_path, response.content)
+    assert len(doc.modelspace()) == 0
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_multi_chunk_plan(client, tmp_path, binary):
+    room_count = dxf_stream.ROOMS_PER_CHUNK * 2 + 1
+    body = plan_body([make_room(i) for i in range(room_count)])
+
+    chunks = list(dxf_stream.stream_plan_dxf(io.BytesIO(body.encode()), binary=binary))
+    assert len(chunks) == 3
+
+    response = client.post("/api/render", params={"binary": binary}, content=body)
+    assert response.status_code == 200
+    assert response.content == b"".join(chunks)
+
+    doc = read_dxf(tmp_path, response.content)
+    msp = doc.modelspace()
+    # outline, label, one door and one window per room
+    assert len(msp) == room_count * 4
+    assert len(msp.query("POLYLINE[layer=='ROOMS']")) == room_count
+    assert len(msp.query("TEXT")) == room_count
+    assert msp.query("TEXT")[0].dxf.text == "Room 0 (200×150)"
+    for name, color in LAYER_COLORS.items():
+        assert doc.layers.get(name).dxf.color == color
@@ -0,0 +1,131 @@
+import copy
+import os
+import random
+import pytest
+import plan_history
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_history, "HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(plan_history, "_sessions", plan_history.OrderedDict())
+
+
+def make_room(name, x=0, y=0):
+    return {
+        "name": name,
+        "width": 100,
+        "height": 80,
+        "position": {"x": x, "y": y},
+        "doors": [{"position": "right", "width": 30}],
+    }
+
+
+def make_plan(rooms):
+    return {"floor_plan": {"dimensions": {"total_area": 1000, "unit": "sq_ft"}, "rooms": rooms}}
+
+
+def random_edit(plan, rng, step):
+    plan = copy.deepcopy(plan)
+    rooms = plan["floor_plan"]["rooms"]
+    choice = rng.randrange(7)
+    if choice == 0:
+        # duplicate names and names that look like a duplicate suffix
+        rooms.append(make_room(rng.choice(["A", "A#2", "A#3", "B", f"Room {step}"])))
+    elif choice == 1 and len(rooms) > 1:
+        rooms.pop(rng.randrange(len(rooms)))
+    elif choice == 2:
+        rng.shuffle(rooms)
+    elif choice == 3 and rooms:
+        rooms[rng.randrange(len(rooms))]["position"]["x"] += 10
+    elif choice == 4 and rooms:
+        room = rooms[rng.randrange(len(rooms))]
+        room["width"] += 5
+        room.pop("doors", None)
+    elif choice == 5:
+        plan["floor_plan"]["dimensions"]["total_area"] += 1
+    else:
+        plan["note"] = f"step {step}"
+    return plan
+
+
+def test_commit_get_round_trip():
+    rng = random.Random(7)
+    plans = [make_plan([make_room("A"), make_room("A"), make_room("A#2")])]
+    for step in range(80):
+        plans.append(random_edit(plans[-1], rng, step))
+
+    history = plan_history.get_history("round-trip")
+    versions = [history.commit(plan) for plan in plans]
+    for version, plan in zip(versions, plans):
+        assert history.get(version) == plan
+
+    # fresh instance, everything rebuilt from the files on disk
+    reloaded = plan_history.PlanHistory("round-trip")
+    for version, plan in zip(versions, plans):
+        assert reloaded.get(version) == plan
+    kinds = {entry["kind"] for entry in reloaded.list_versions()}
+    assert kinds == {"snapshot", "delta"}
+
+
+def test_duplicate_names_kept_distinct():
+    old = make_plan([make_room("A"), make_room("A"), make_room("A#2")])
+    new = make_plan([make_room("A#2", x=5), make_room("A"), make_room("A", y=9)])
+    assert plan_history.apply_delta(old, plan_history.diff_plans(old, new)) == new
+
+
+def test_undo_redo():
+    history = plan_history.get_history("undo")
+    first = history.commit(make_plan([make_room("Kitchen")]))
+    second = history.commit(make_plan([make_room("Kitchen", x=50)]))
+
+    assert history.undo() == first
+    assert history.undo() is None
+    assert history.redo() == second
+    assert history.redo() is None
+    assert history.get(history.current) == make_plan([make_room("Kitchen", x=50)])
+
+
+def test_invalid_session_id():
+    with pytest.raises(ValueError):
+        plan_history.get_history("../escape")
+
+
+def test_render_cache_is_bounded():
+    history = plan_history.get_history("render")
+    versions = [history.commit(make_plan([make_room("Hall", x=i * 10)])) for i in range(10)]
+    for version in versions:
+        history.render(version)
+
+    rendered = [f for f in os.listdir(history.path) if f.endswith(".dxf")]
+    assert len(rendered) == plan_history.RENDER_CACHE_SIZE
+
+    # an evicted version is rebuilt from its deltas and rendered again
+    dxf_path = history.render(versions[0])
+    assert os.path.exists(dxf_path)
+    assert history.index["rendered"][-1] == versions[0]
+
+
+def test_sessions_are_bounded(monkeypatch):
+    monkeypatch.setattr(plan_history, "SESSION_CACHE_SIZE", 2)
+    first = plan_history.get_history("first")
+    version = first.commit(make_plan([make_room("Study")]))
+    plan_history.get_history("second")
+    plan_history.get_history("third")
+    assert list(plan_history._sessions) == ["second", "third"]
+
+    # an evicted session is loaded again from disk
+    reloaded = plan_history.get_history("first")
+    assert reloaded is not first
+    assert reloaded.current == version
+
+
+def test_unreadable_index_is_not_a_client_error():
+    history = plan_history.get_history("torn")
+    history.commit(make_plan([make_room("Porch")]))
+    assert not [f for f in os.listdir(history.path) if f.endswith(".tmp")]
+
+    with open(history.index_path, "w") as f:
+        f.write('{"versions": {')
+    with pytest.raises(RuntimeError):
+        plan_history.PlanHistory("torn")